@@ -11,9 +11,17 @@ It detects connection type (gateway vs primary) from parametrized test names.
 """
 
 import json
+import re
 import sys
 import os
 from collections import defaultdict
+from functools import lru_cache
+from itertools import groupby
+
+try:
+    import orjson  # optional: faster C parser for large benchmark files
+except ImportError:
+    orjson = None
 
 CSS = """
 body { font-family: -apple-system, BlinkMacSystemFont, Segoe UI, Roboto, Helvetica, Arial, sans-serif; margin: 24px; }
@@ -24,11 +32,14 @@ h1 { margin-bottom: 8px; }
 .badge { display: inline-block; padding: 2px 8px; border-radius: 12px; font-size: 12px; }
 .badge.gateway { background: #e6f4ff; color: #0b6efb; border: 1px solid #bcd8ff; }
 .badge.primary { background: #e8f5e9; color: #2e7d32; border: 1px solid #c8e6c9; }
+.group-hdr td { background-color: #fafafa; font-weight: 600; }
 .small { color: #666; font-size: 12px; }
 .footer { margin-top: 16px; color: #666; font-size: 12px; }
 """
 
-HTML_TEMPLATE = """
+# The page is written as HEADER, one line per row, then FOOTER so rows can be
+# streamed to the output file without building the whole document in memory.
+HTML_HEADER = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -54,30 +65,44 @@ HTML_TEMPLATE = """
 </tr>
 </thead>
 <tbody>
-{rows}
-</tbody>
+"""
+
+HTML_FOOTER = """</tbody>
 </table>
 <div class="footer">Source: {json_path}</div>
 </body>
 </html>
 """
 
+GROUP_TEMPLATE = "<tr class='group-hdr'><td colspan='9'>{base}{overhead}</td></tr>\n"
+
+ROW_TEMPLATE = (
+    "<tr>"
+    "<td>{name}</td>"
+    "<td><span class='{badge_class}'>{conn}</span></td>"
+    "<td>{rounds}</td>"
+    "<td>{iterations}</td>"
+    "<td>{min}</td>"
+    "<td>{max}</td>"
+    "<td>{mean}</td>"
+    "<td>{median}</td>"
+    "<td>{stddev}</td>"
+    "</tr>\n"
+)
+
 
+# pytest adds parameters like: test_name[param_id]
+# We use id="gateway" or id="primary" in benchmarks
+_CONN_RE = re.compile(r"\[(gateway|primary)\]")
+# fallback: look for keywords anywhere in the name
+_CONN_FALLBACK_RE = re.compile(r"(gateway|primary)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
 def detect_connection(name: str) -> str:
     """Infer connection label from parametrized name."""
-    # pytest adds parameters like: test_name[param_id]
-    # We use id="gateway" or id="primary" in benchmarks
-    if "[gateway]" in name:
-        return "gateway"
-    if "[primary]" in name:
-        return "primary"
-    # fallback: look for keywords
-    lower = name.lower()
-    if "gateway" in lower:
-        return "gateway"
-    if "primary" in lower:
-        return "primary"
-    return "unknown"
+    m = _CONN_RE.search(name) or _CONN_FALLBACK_RE.search(name)
+    return m.group(1).lower() if m else "unknown"
 
 
 def _ms(val):
@@ -87,27 +112,73 @@ def _ms(val):
         return val
 
 
-def render_rows(benchmarks):
-    rows = []
-    for b in benchmarks:
-        name = b.get("name") or b.get("fullname")
-        stats = b.get("stats", {})
-        conn = detect_connection(name)
-        badge_class = "badge gateway" if conn == "gateway" else ("badge primary" if conn == "primary" else "badge")
-        rows.append(
-            f"<tr>"
-            f"<td>{name}</td>"
-            f"<td><span class='{badge_class}'>{conn}</span></td>"
-            f"<td>{stats.get('rounds','')}</td>"
-            f"<td>{stats.get('iterations','')}</td>"
-            f"<td>{_ms(stats.get('min',''))}</td>"
-            f"<td>{_ms(stats.get('max',''))}</td>"
-            f"<td>{_ms(stats.get('mean',''))}</td>"
-            f"<td>{_ms(stats.get('median',''))}</td>"
-            f"<td>{_ms(stats.get('stddev',''))}</td>"
-            f"</tr>"
-        )
-    return "\n".join(rows)
+def load_benchmarks(path):
+    """Read the benchmark list from a pytest-benchmark JSON file."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson else json.loads(raw)
+    return data.get("benchmarks", [])
+
+
+def _base_name(name: str) -> str:
+    """Strip the pytest parameter suffix: test_x[gateway] -> test_x."""
+    return name.split("[", 1)[0]
+
+
+def _pair_key(name: str) -> str:
+    """Parameter id minus the connection token: test_x[psycopg2-gateway] -> psycopg2."""
+    params = name[len(_base_name(name)) + 1:-1] if "[" in name else ""
+    return "-".join(t for t in params.split("-") if t and t.lower() not in ("gateway", "primary"))
+
+
+def _gateway_overhead(group):
+    """
+    Return ' (gateway/primary mean: ...)' with one ratio per gateway/primary pair.
+
+    Rows are paired on their parameter id with the connection token removed,
+    so test_x[psycopg2-gateway] is compared with test_x[psycopg2-primary];
+    a group whose only other parameter is the connection shows a bare ratio.
+    """
+    means = defaultdict(dict)
+    for name, b in group:
+        means[_pair_key(name)][detect_connection(name)] = b.get("stats", {}).get("mean")
+    ratios = []
+    for key in sorted(means):
+        pair = means[key]
+        try:
+            ratio = float(pair["gateway"]) / float(pair["primary"])
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            continue
+        ratios.append(f"{key} {ratio:.2f}x" if key else f"{ratio:.2f}x")
+    return f" (gateway/primary mean: {', '.join(ratios)})" if ratios else ""
+
+
+def iter_rows(benchmarks):
+    """Yield rendered <tr> lines, grouped by benchmark with one header row per group."""
+    named = sorted(
+        ((b.get("name") or b.get("fullname"), b) for b in benchmarks),
+        key=lambda nb: (_base_name(nb[0]), detect_connection(nb[0]), nb[0]),
+    )
+    for base, group in groupby(named, key=lambda nb: _base_name(nb[0])):
+        group = list(group)
+        yield GROUP_TEMPLATE.format(base=base, overhead=_gateway_overhead(group))
+        for name, b in group:
+            stats = b.get("stats", {})
+            conn = detect_connection(name)
+            badge_class = "badge gateway" if conn == "gateway" else ("badge primary" if conn == "primary" else "badge")
+            yield ROW_TEMPLATE.format(
+                # The group header carries the base name; rows only show the parameters
+                name=name[len(base):] or name,
+                badge_class=badge_class,
+                conn=conn,
+                rounds=stats.get('rounds', ''),
+                iterations=stats.get('iterations', ''),
+                min=_ms(stats.get('min', '')),
+                max=_ms(stats.get('max', '')),
+                mean=_ms(stats.get('mean', '')),
+                median=_ms(stats.get('median', '')),
+                stddev=_ms(stats.get('stddev', '')),
+            )
 
 
 def main():
@@ -117,17 +188,13 @@ def main():
     input_json = sys.argv[1]
     output_html = sys.argv[2]
 
-    with open(input_json, "r") as f:
-        data = json.load(f)
-
-    benchmarks = data.get("benchmarks", [])
-    rows_html = render_rows(benchmarks)
-
-    html = HTML_TEMPLATE.format(css=CSS, rows=rows_html, json_path=os.path.abspath(input_json))
+    benchmarks = load_benchmarks(input_json)
 
     os.makedirs(os.path.dirname(output_html), exist_ok=True)
     with open(output_html, "w") as f:
-        f.write(html)
+        f.write(HTML_HEADER.format(css=CSS))
+        f.writelines(iter_rows(benchmarks))
+        f.write(HTML_FOOTER.format(json_path=os.path.abspath(input_json)))
 
     print(f"Wrote HTML report to: {output_html}")
 
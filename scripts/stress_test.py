@@ -1,9 +1,11 @@
 import psycopg2
+import os
 import time
-import threading
 from concurrent.futures import ThreadPoolExecutor
 import random
 import statistics
+import heapq
+from array import array
 
 # Config
 PGPOOL_HOST = 'localhost'
@@ -13,14 +15,22 @@ DB_USER = 'postgres'
 DB_PASSWORD = 'postgres'
 NUM_REQUESTS = 2000   # total requests per thread, performed one by one.
 CONCURRENT_TESTS = 45  # number of concurrent threads
+BATCH_SIZE = 10       # payloads sent per round-trip; 1 restores one-by-one requests
+VERBOSE = os.environ.get("STRESS_VERBOSE", "0") == "1"  # log every successful batch
+# Seeds every worker's RNG; set STRESS_SEED to replay the payloads of an earlier run
+RUN_SEED = int(os.environ.get("STRESS_SEED", time.time_ns() % 2**32))
 
 
 # Shared data
-insert_durations = []
-read_durations = []
+# Per-batch timings (integer nanoseconds) are preallocated; each worker owns
+# the disjoint slice starting at thread_id * SAMPLES_PER_THREAD, so no
+# locking is needed.
+SAMPLES_PER_THREAD = -(-NUM_REQUESTS // BATCH_SIZE)
+insert_durations = array('q', bytes(8 * CONCURRENT_TESTS * SAMPLES_PER_THREAD))
+read_durations = array('q', bytes(8 * CONCURRENT_TESTS * SAMPLES_PER_THREAD))
+samples_recorded = [0] * CONCURRENT_TESTS
 read_failures = 0
 read_successes = 0
-lock = threading.Lock()
 
 def setup_database():
     try:
@@ -65,6 +75,8 @@ def create_table():
                         data TEXT NOT NULL
                     );
                 """)
+                # Rows left by earlier runs would satisfy this run's read-backs
+                cur.execute("TRUNCATE test_stress")
                 conn.commit()
                 print("[INIT] Table 'test_stress' is ready.")
     except Exception as e:
@@ -72,7 +84,12 @@ def create_table():
         exit(1)
 
 def stress_worker(thread_id):
-    global read_failures, read_successes
+    """Run one worker and return its (successes, failures) read counts."""
+    base = thread_id * SAMPLES_PER_THREAD
+    recorded = 0
+    successes = 0
+    failures = 0
+    log = []  # flushed with a single print when the worker finishes
     try:
         conn = psycopg2.connect(
             host=PGPOOL_HOST,
@@ -83,56 +100,80 @@ def stress_worker(thread_id):
         )
         conn.autocommit = True
         cur = conn.cursor()
-
-        for i in range(NUM_REQUESTS):
-            payload = f"thread-{thread_id}-req-{i}-{random.randint(0, 100000)}"
+        # Parse/plan once per session; batches are passed as text[] so one
+        # prepared statement serves any BATCH_SIZE
+        cur.execute("PREPARE ins(text[]) AS INSERT INTO test_stress (data) SELECT unnest($1)")
+        cur.execute("PREPARE sel(text[]) AS SELECT data FROM test_stress WHERE data = ANY($1)")
+
+        # Draw all suffixes up front from a per-thread RNG, seeded per run for reproducibility
+        suffixes = random.Random(f"{RUN_SEED}-{thread_id}").choices(range(100001), k=NUM_REQUESTS)
+        payloads = [
+            f"thread-{thread_id}-req-{i}-{suffix}"
+            for i, suffix in enumerate(suffixes)
+        ]
+        for start in range(0, NUM_REQUESTS, BATCH_SIZE):
+            batch = payloads[start:start + BATCH_SIZE]
+            expected = set(batch)
             try:
-                # INSERT
-                start_insert = time.perf_counter()
-                cur.execute("INSERT INTO test_stress (data) VALUES (%s)", (payload,))
-                end_insert = time.perf_counter()
-
-                # SELECT
-                start_read = time.perf_counter()
-                cur.execute("SELECT data FROM test_stress WHERE data = %s", (payload,))
-                result = cur.fetchone()
-                end_read = time.perf_counter()
-
-                insert_time = end_insert - start_insert
-                read_time = end_read - start_read
-
-                with lock:
-                    insert_durations.append(insert_time)
-                    read_durations.append(read_time)
-
-                    if result and result[0] == payload:
-                        read_successes += 1
-                        print(f"[OK] Thread {thread_id} Request {i}")
-                    else:
-                        read_failures += 1
-                        print(f"[FAIL] Thread {thread_id} Request {i} -> Inconsistent read")
+                # INSERT the whole batch in one round-trip
+                start_insert = time.perf_counter_ns()
+                cur.execute("EXECUTE ins(%s)", (batch,))
+                end_insert = time.perf_counter_ns()
+
+                # SELECT the batch back in one round-trip
+                start_read = time.perf_counter_ns()
+                cur.execute("EXECUTE sel(%s)", (batch,))
+                found = {row[0] for row in cur.fetchall()}
+                end_read = time.perf_counter_ns()
+
+                missing = len(expected - found)
+
+                insert_durations[base + recorded] = end_insert - start_insert
+                read_durations[base + recorded] = end_read - start_read
+                recorded += 1
+                successes += len(batch) - missing
+                failures += missing
+
+                if missing:
+                    log.append(f"[FAIL] Thread {thread_id} Batch {start} -> {missing} inconsistent reads")
+                elif VERBOSE:
+                    log.append(f"[OK] Thread {thread_id} Batch {start}")
             except Exception as e:
-                with lock:
-                    read_failures += 1
-                    print(f"[ERROR] Thread {thread_id} Request {i}: {e}")
+                failures += len(batch)
+                log.append(f"[ERROR] Thread {thread_id} Batch {start}: {e}")
         cur.close()
         conn.close()
     except Exception as e:
-        with lock:
-            print(f"[CONN ERROR] Thread {thread_id}: {e}")
+        log.append(f"[CONN ERROR] Thread {thread_id}: {e}")
+    samples_recorded[thread_id] = recorded
+    if log:
+        print("\n".join(log))
+    return successes, failures
+
+def recorded_samples(buf):
+    """Compact the filled part of each worker's slice into one array."""
+    out = array(buf.typecode)
+    for tid, n in enumerate(samples_recorded):
+        start = tid * SAMPLES_PER_THREAD
+        out.extend(buf[start:start + n])
+    return out
 
 def summarize(name, durations):
+    """Print stats for durations given in nanoseconds, reported in seconds."""
     if not durations:
         print(f"No data for {name}")
         return
 
-    mean = statistics.mean(durations)
+    count = len(durations)
+    mean = statistics.fmean(durations)
     median = statistics.median(durations)
-    stdev = statistics.stdev(durations) if len(durations) > 1 else 0.0
-    p99 = sorted(durations)[int(0.99 * len(durations)) - 1]
+    stdev = statistics.stdev(durations, mean) if count > 1 else 0.0
+    # Only the top 1% is needed for p99; avoid sorting a full copy
+    p99 = heapq.nlargest(count - int(0.99 * count) + 1, durations)[-1]
+    mean, median, stdev, p99 = (v / 1e9 for v in (mean, median, stdev, p99))
 
-    print(f"\n{name} Duration Stats (seconds):")
-    print(f"  Count      : {len(durations)}")
+    print(f"\n{name} Duration Stats (seconds per batch of up to {BATCH_SIZE}):")
+    print(f"  Count      : {count}")
     print(f"  Mean       : {mean:.6f}")
     print(f"  Median     : {median:.6f}")
     print(f"  Std Dev    : {stdev:.6f}")
@@ -147,20 +188,24 @@ def print_summary():
     success_rate = (read_successes / total_reads) * 100 if total_reads else 0
     print(f"  Success Rate       : {success_rate:.2f}%")
 
-    summarize("INSERT", insert_durations)
-    summarize("READ", read_durations)
+    summarize("INSERT", recorded_samples(insert_durations))
+    summarize("READ", recorded_samples(read_durations))
 
 def main():
+    global read_failures, read_successes
     setup_database()
     create_table()
 
     start = time.time()
-    print(f"\n\U0001F680 Starting stress test with {CONCURRENT_TESTS} threads and {NUM_REQUESTS} requests per thread...\n")
+    print(f"\n\U0001F680 Starting stress test with {CONCURRENT_TESTS} threads and {NUM_REQUESTS} requests per thread (batches of {BATCH_SIZE}, STRESS_SEED={RUN_SEED})...\n")
 
     with ThreadPoolExecutor(max_workers=CONCURRENT_TESTS) as executor:
         futures = [executor.submit(stress_worker, tid) for tid in range(CONCURRENT_TESTS)]
+        # Merge per-worker counters once instead of locking on every request
         for f in futures:
-            f.result()
+            successes, failures = f.result()
+            read_successes += successes
+            read_failures += failures
 
     total_time = time.time() - start
     print(f"\n✅ Stress test completed in {total_time:.2f} seconds")
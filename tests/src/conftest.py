@@ -8,25 +8,38 @@ This module provides fixtures to:
 - Manage test database lifecycle
 """
 
+import fcntl
 import os
+import socket
 import time
 import subprocess
 import pytest
 import psycopg2
 import requests
 import docker
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from psycopg2.pool import ThreadedConnectionPool
 from pathlib import Path
-from contextlib import contextmanager
-from typing import Generator, Optional
+from types import MappingProxyType
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Generator, Mapping, Optional
 
 # Configuration
-PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-REPORTS_DIR = os.path.join(PROJECT_ROOT, "reports")
-TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-COMPOSE_FILE = os.path.join(TESTS_DIR, "docker-compose-patroni.yml")
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+REPORTS_DIR = PROJECT_ROOT / "reports"
+TESTS_DIR = PROJECT_ROOT / "tests"
+COMPOSE_FILE = TESTS_DIR / "docker-compose-patroni.yml"
 PATRONI_REPO_URL = "https://github.com/patroni/patroni.git"
-PATRONI_REPO_DIR = os.path.join(PROJECT_ROOT, "patroni-repo")
+PATRONI_REPO_DIR = PROJECT_ROOT / "patroni-repo"
 PATRONI_IMAGE_NAME = "patroni"
+# Set PG_GATEWAY_REBUILD_PATRONI=1 to force a rebuild of an existing Patroni image
+REBUILD_PATRONI = os.environ.get("PG_GATEWAY_REBUILD_PATRONI") == "1"
+# Set PG_GATEWAY_KEEP=1 to leave the cluster running after the session for faster re-runs
+KEEP_CLUSTER = os.environ.get("PG_GATEWAY_KEEP") == "1"
+GATEWAY_IMAGE_NAME = "pg-gateway:latest"  # must match `image:` of pg_gateway in COMPOSE_FILE
 
 # Connection settings
 GATEWAY_HOST = "localhost"
@@ -44,9 +57,13 @@ PG_DATABASE = "postgres"
 TEST_DATABASE = "test_pg_gateway"
 
 # Timing
-MIN_HEALTH_WAIT = 15  # seconds
+MIN_HEALTH_WAIT = 0  # seconds
 MAX_HEALTH_WAIT = 90  # seconds
-HEALTH_CHECK_INTERVAL = 3  # seconds
+HEALTH_CHECK_INTERVAL = 1  # seconds, initial poll interval (doubles on each miss)
+MAX_HEALTH_CHECK_INTERVAL = 4  # seconds
+PRIMARY_INFO_TTL = 1.0  # seconds a get_primary_info() answer is reused by later calls
+LEADER_POLL_INTERVAL = 0.1  # seconds between GET /cluster calls while waiting for a new leader
+REPLICA_REJOIN_TIMEOUT = 60  # seconds a restarted node gets to rejoin as a running replica
 
 
 class PatroniCluster:
@@ -54,18 +71,27 @@ class PatroniCluster:
 
     def __init__(self):
         self.docker_client = docker.from_env()
+        self._session = requests.Session()  # keep-alive for Patroni REST API calls
+        # Retry gateway errors only. Not 503: /primary answers 503 on every
+        # replica, and that is an answer, not a failure. Not refused connects
+        # or read timeouts either: those mean a stopped or booting node, and
+        # backing off on them would stall every failover poll.
+        retry = Retry(total=3, connect=0, read=0, backoff_factor=0.3, status_forcelist=[502, 504])
+        self._session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+        self._primary_cache = (0.0, None)  # (monotonic time, get_primary_info() result)
+        self._stopped_nodes = []  # containers stopped by trigger_failover()
         self._compose_started = False
 
     def _ensure_patroni_repo(self) -> bool:
         """Clone Patroni repo if it doesn't exist."""
-        if os.path.exists(PATRONI_REPO_DIR):
+        if PATRONI_REPO_DIR.exists():
             print(f"  ✓ Patroni repo exists at {PATRONI_REPO_DIR}")
             return True
         
         print(f"  Cloning Patroni repo from {PATRONI_REPO_URL}...")
         try:
             result = subprocess.run(
-                ["git", "clone", PATRONI_REPO_URL, PATRONI_REPO_DIR],
+                ["git", "clone", "--depth=1", PATRONI_REPO_URL, PATRONI_REPO_DIR],
                 check=True,
                 capture_output=True,
                 text=True,
@@ -81,15 +107,22 @@ class PatroniCluster:
             return False
 
     def _build_patroni_image(self) -> bool:
-        """Build the Patroni Docker image from the repo."""
+        """Build the Patroni Docker image from the repo, unless it already exists."""
+        if not REBUILD_PATRONI and self.docker_client.images.list(name=PATRONI_IMAGE_NAME):
+            print(f"  ✓ Docker image '{PATRONI_IMAGE_NAME}' exists, skipping build")
+            return True
+
         print(f"  Building Docker image '{PATRONI_IMAGE_NAME}' from {PATRONI_REPO_DIR}...")
         try:
-            result = subprocess.run(
+            # CLI rather than images.build(): the SDK uses the legacy builder,
+            # which skips the BuildKit cache the gateway build shares
+            subprocess.run(
                 ["docker", "build", "-t", PATRONI_IMAGE_NAME, "."],
                 check=True,
                 capture_output=True,
                 text=True,
                 cwd=PATRONI_REPO_DIR,
+                env={**os.environ, "DOCKER_BUILDKIT": "1"},
                 timeout=600
             )
             print(f"  ✓ Built Docker image '{PATRONI_IMAGE_NAME}'")
@@ -101,6 +134,28 @@ class PatroniCluster:
             print(f"  ✗ Build timed out (600s)")
             return False
 
+    def _ensure_gateway_image(self) -> bool:
+        """Build the pg_gateway image with BuildKit so unchanged layers come from cache."""
+        print(f"  Building Docker image '{GATEWAY_IMAGE_NAME}' from {PROJECT_ROOT}...")
+        try:
+            subprocess.run(
+                ["docker", "build", "-t", GATEWAY_IMAGE_NAME, "."],
+                check=True,
+                capture_output=True,
+                text=True,
+                cwd=PROJECT_ROOT,
+                env={**os.environ, "DOCKER_BUILDKIT": "1"},
+                timeout=600
+            )
+            print(f"  ✓ Built Docker image '{GATEWAY_IMAGE_NAME}'")
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"  ✗ Build failed: {e.stderr[-500:]}")  # Last 500 chars
+            return False
+        except subprocess.TimeoutExpired:
+            print(f"  ✗ Build timed out (600s)")
+            return False
+
     def start(self) -> bool:
         """Start the Docker Compose stack."""
         # Step 1: Ensure Patroni repo is cloned
@@ -115,12 +170,18 @@ class PatroniCluster:
             print(f"[ERROR] Failed to build Patroni image")
             return False
         
-        # Step 3: Start Docker Compose
-        print(f"[3] Starting Docker Compose with: {COMPOSE_FILE}")
+        # Step 3: Build the gateway image (cached layers make this cheap when unchanged)
+        print(f"[3] Building gateway Docker image '{GATEWAY_IMAGE_NAME}'...")
+        if not self._ensure_gateway_image():
+            print(f"[ERROR] Failed to build gateway image")
+            return False
+
+        # Step 4: Start Docker Compose (images are already built, so no --build)
+        print(f"[4] Starting Docker Compose with: {COMPOSE_FILE}")
         print(f"    Working directory: {PROJECT_ROOT}")
         try:
             result = subprocess.run(
-                ["docker", "compose", "-f", COMPOSE_FILE, "up", "-d", "--build"],
+                ["docker", "compose", "-f", COMPOSE_FILE, "up", "-d"],
                 check=True,
                 capture_output=True,
                 text=True,
@@ -140,23 +201,21 @@ class PatroniCluster:
         if self._compose_started:
             # Save gateway logs before stopping
             try:
-                Path(REPORTS_DIR).mkdir(parents=True, exist_ok=True)
-                log_file = os.path.join(REPORTS_DIR, "gateway.log")
-                result = subprocess.run(
-                    ["docker", "logs", "pg_gateway"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                )
-                with open(log_file, "w") as f:
-                    f.write(result.stdout)
-                    if result.stderr:
-                        f.write("\n=== STDERR ===\n")
-                        f.write(result.stderr)
+                REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+                log_file = REPORTS_DIR / "gateway.log"
+                # Stream chunks straight into the file instead of buffering the whole log
+                container = self.docker_client.containers.get("pg_gateway")
+                with open(log_file, "wb") as f:
+                    for chunk in container.logs(stream=True, follow=False, tail=20000, timestamps=True):
+                        f.write(chunk)
                 print(f"[INFO] Gateway logs saved to {log_file}")
             except Exception as e:
                 print(f"[WARN] Failed to save gateway logs: {e}")
-            
+
+            if KEEP_CLUSTER:
+                print("[INFO] PG_GATEWAY_KEEP=1, leaving the cluster running")
+                return
+
             # Stop the compose stack
             subprocess.run(
                 ["docker", "compose", "-f", COMPOSE_FILE, "down", "-v"],
@@ -169,79 +228,153 @@ class PatroniCluster:
         """
         Wait for the Patroni cluster to become healthy.
         
-        Waits minimum MIN_HEALTH_WAIT seconds, then checks until healthy
-        or MAX_HEALTH_WAIT is reached.
+        Waits minimum MIN_HEALTH_WAIT seconds, then polls with exponential
+        backoff (HEALTH_CHECK_INTERVAL up to MAX_HEALTH_CHECK_INTERVAL) until
+        Patroni has a primary and pg_gateway routes to it, or timeout is reached.
         """
-        print(f"\nWaiting minimum {MIN_HEALTH_WAIT}s for cluster initialization...")
-        time.sleep(MIN_HEALTH_WAIT)
-
-        elapsed = MIN_HEALTH_WAIT
-        while elapsed < timeout:
-            if self._check_cluster_health():
-                print(f"Cluster healthy after {elapsed}s")
+        if MIN_HEALTH_WAIT:
+            print(f"\nWaiting minimum {MIN_HEALTH_WAIT}s for cluster initialization...")
+            time.sleep(MIN_HEALTH_WAIT)
+
+        start = time.monotonic()
+        interval = HEALTH_CHECK_INTERVAL
+        while True:
+            if self._check_cluster_health() and self._check_gateway_ready():
+                print(f"Cluster healthy after {MIN_HEALTH_WAIT + time.monotonic() - start:.1f}s")
                 return True
-            time.sleep(HEALTH_CHECK_INTERVAL)
-            elapsed += HEALTH_CHECK_INTERVAL
-            print(f"Waiting for cluster health... ({elapsed}s)")
+            elapsed = MIN_HEALTH_WAIT + time.monotonic() - start
+            if elapsed + interval >= timeout:
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_HEALTH_CHECK_INTERVAL)
+            print(f"Waiting for cluster health... ({MIN_HEALTH_WAIT + time.monotonic() - start:.1f}s)")
 
         print(f"Cluster not healthy after {timeout}s")
         return False
 
     def _check_cluster_health(self) -> bool:
-        """Check if the Patroni cluster has a healthy primary via HAProxy."""
-        # Try connecting through HAProxy primary port
+        """Check if the Patroni cluster has a healthy primary via the Patroni REST API."""
+        if self.get_primary_info() is None:
+            print("Health check failed: no node answered 200 on /primary")
+            return False
+        return True
+
+    def _check_gateway_ready(self) -> bool:
+        """Check that a gateway connection runs SELECT 1 on a server that is not in recovery."""
         try:
-            conn = psycopg2.connect(
-                host="localhost",
-                port=HAPROXY_PRIMARY_PORT,
+            with closing(psycopg2.connect(
+                host=GATEWAY_HOST,
+                port=GATEWAY_PORT,
                 user=PG_USER,
                 password=PG_PASSWORD,
                 database=PG_DATABASE,
-                connect_timeout=5
-            )
-            conn.autocommit = True
-            cursor = conn.cursor()
-            cursor.execute("SELECT pg_is_in_recovery()")
-            is_replica = cursor.fetchone()[0]
-            cursor.close()
-            conn.close()
-            # HAProxy primary port should connect to non-recovery (primary) node
-            return not is_replica
-        except (psycopg2.OperationalError, psycopg2.Error) as e:
-            print(f"Health check failed: {e}")
+                connect_timeout=2,
+            )) as conn:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1, pg_is_in_recovery()")
+                    result, in_recovery = cursor.fetchone()
+        except psycopg2.Error as e:
+            print(f"Health check failed: gateway not ready ({e})")
+            return False
+        if result != 1 or in_recovery:
+            print("Health check failed: gateway routed to a server in recovery")
+            return False
+        return True
+
+    def _is_primary(self, host: str, api_port: int) -> bool:
+        """Return True if Patroni at host:api_port reports itself as the running primary.
+
+        Patroni answers GET /primary with 200 on the leader and 503 elsewhere,
+        which is far cheaper than a PostgreSQL connect + auth + query.
+        """
+        try:
+            response = self._session.get(f"http://{host}:{api_port}/primary", timeout=(1, 2))
+            return response.status_code == 200
+        except requests.RequestException:
             return False
 
     def get_primary_info(self) -> Optional[dict]:
-        """Get information about the current primary node by checking each Patroni node."""
-        for host, pg_port, api_port in PATRONI_HOSTS:
+        """
+        Get information about the current primary node.
+
+        Answers are reused for PRIMARY_INFO_TTL seconds so back-to-back callers
+        (fixtures, polling loops) share one round of Patroni API probes.
+        """
+        fetched_at, primary = self._primary_cache
+        if time.monotonic() - fetched_at < PRIMARY_INFO_TTL:
+            return primary
+        primary = self._probe_primary()
+        self._primary_cache = (time.monotonic(), primary)
+        return primary
+
+    def _probe_primary(self) -> Optional[dict]:
+        """Probe all Patroni nodes concurrently and return the first that reports primary."""
+        executor = ThreadPoolExecutor(max_workers=len(PATRONI_HOSTS))
+        futures = {
+            executor.submit(self._is_primary, host, api_port): index
+            for index, (host, pg_port, api_port) in enumerate(PATRONI_HOSTS)
+        }
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    return self._node_info(futures[future])
+            return None
+        finally:
+            # Don't block on slower (e.g. unreachable) nodes once the primary answered
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _node_info(index: int) -> dict:
+        """Describe PATRONI_HOSTS[index] in the shape returned by get_primary_info()."""
+        host, pg_port, api_port = PATRONI_HOSTS[index]
+        return {
+            "host": host,
+            "pg_port": pg_port,
+            "api_port": api_port,
+            "name": f"patroni{index + 1}",
+        }
+
+    def _cluster_members(self, indices) -> Optional[list]:
+        """Ask nodes (in the given order) for GET /cluster; return the first answer's members."""
+        for index in indices:
+            host, pg_port, api_port = PATRONI_HOSTS[index]
             try:
-                # Try to connect to PostgreSQL and check if it's primary
-                conn = psycopg2.connect(
-                    host=host,
-                    port=pg_port,
-                    user=PG_USER,
-                    password=PG_PASSWORD,
-                    database=PG_DATABASE,
-                    connect_timeout=3
-                )
-                conn.autocommit = True
-                cursor = conn.cursor()
-                cursor.execute("SELECT pg_is_in_recovery()")
-                is_replica = cursor.fetchone()[0]
-                cursor.close()
-                conn.close()
-                
-                if not is_replica:
-                    return {
-                        "host": host,
-                        "pg_port": pg_port,
-                        "api_port": api_port,
-                        "name": f"patroni{PATRONI_HOSTS.index((host, pg_port, api_port)) + 1}",
-                    }
-            except (psycopg2.OperationalError, psycopg2.Error):
+                response = self._session.get(f"http://{host}:{api_port}/cluster", timeout=(1, 2))
+                if response.status_code != 200:
+                    continue
+                return response.json().get("members", [])
+            except (requests.RequestException, ValueError):
                 continue
         return None
 
+    def _cluster_leader(self, indices) -> Optional[str]:
+        """Ask nodes (in the given order) for GET /cluster; return the running leader's name."""
+        for member in self._cluster_members(indices) or []:
+            if member.get("role") == "leader" and member.get("state") == "running":
+                return member.get("name")
+        return None
+
+    def wait_for_leader_change(self, old_name: Optional[str], timeout: float = 30) -> Optional[dict]:
+        """
+        Block until Patroni reports a running leader other than ``old_name``.
+
+        Patroni has no long-poll endpoint, so this re-issues GET /cluster on the
+        keep-alive session every LEADER_POLL_INTERVAL, asking the old leader last.
+        Returns the new primary as get_primary_info() would, or None on timeout.
+        """
+        names = [f"patroni{i + 1}" for i in range(len(PATRONI_HOSTS))]
+        indices = sorted(range(len(PATRONI_HOSTS)), key=lambda i: names[i] == old_name)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            leader = self._cluster_leader(indices)
+            if leader and leader != old_name and leader in names:
+                primary = self._node_info(names.index(leader))
+                self._primary_cache = (time.monotonic(), primary)
+                return primary
+            time.sleep(LEADER_POLL_INTERVAL)
+        return None
+
     def trigger_failover(self, target_node: Optional[str] = None) -> bool:
         """Trigger a failover by stopping the primary container."""
         primary = self.get_primary_info()
@@ -250,17 +383,44 @@ class PatroniCluster:
 
         try:
             # Stop the primary container to trigger failover
-            container_name = primary["name"]
-            subprocess.run(
-                ["docker", "stop", container_name],
-                check=True,
-                capture_output=True,
-                timeout=30
-            )
+            self.docker_client.containers.get(primary["name"]).stop()
+            self._stopped_nodes.append(primary["name"])
+            self._primary_cache = (0.0, None)  # the cached primary is now stale
             return True
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        except docker.errors.APIError:
             return False
 
+    def restore_stopped_nodes(self, timeout: float = REPLICA_REJOIN_TIMEOUT) -> bool:
+        """
+        Start the containers stopped by trigger_failover() and wait until they rejoin.
+
+        Returns True once every restarted node is listed in GET /cluster as a
+        replica in state running (or streaming, on Patroni 3), False on timeout.
+        """
+        restarted = set()
+        while self._stopped_nodes:
+            name = self._stopped_nodes.pop()
+            try:
+                self.docker_client.containers.get(name).start()
+                restarted.add(name)
+            except docker.errors.APIError as e:
+                print(f"  Could not restart {name}: {e}")
+
+        deadline = time.monotonic() + timeout
+        while restarted:
+            members = self._cluster_members(range(len(PATRONI_HOSTS))) or []
+            rejoined = {
+                member.get("name") for member in members
+                if member.get("role") != "leader" and member.get("state") in ("running", "streaming")
+            }
+            if restarted <= rejoined:
+                return True
+            if time.monotonic() >= deadline:
+                print(f"  Nodes did not rejoin as replicas within {timeout}s: {sorted(restarted - rejoined)}")
+                return False
+            time.sleep(LEADER_POLL_INTERVAL)
+        return True
+
 
 @pytest.fixture(scope="session")
 def patroni_cluster() -> Generator[PatroniCluster, None, None]:
@@ -268,10 +428,17 @@ def patroni_cluster() -> Generator[PatroniCluster, None, None]:
     Session-scoped fixture that starts the Patroni cluster once for all tests.
     
     The cluster is started at the beginning of the test session and
-    stopped after all tests complete.
+    stopped after all tests complete. If a healthy cluster is already
+    running (e.g. kept with PG_GATEWAY_KEEP=1) and pg_gateway already routes
+    to its primary, it is reused and left running.
     """
     cluster = PatroniCluster()
 
+    if cluster._check_cluster_health() and cluster._check_gateway_ready():
+        print("\n[INFO] Reusing already running Patroni cluster")
+        yield cluster
+        return
+
     print("\n" + "=" * 60)
     print("Starting Patroni cluster for testing...")
     print("=" * 60)
@@ -291,12 +458,59 @@ def patroni_cluster() -> Generator[PatroniCluster, None, None]:
     cluster.stop()
 
 
+@pytest.fixture(scope="function")
+def cluster_state_lock(tmp_path_factory) -> Generator[None, None, None]:
+    """
+    Hold an exclusive lock shared by all pytest-xdist workers for the test.
+
+    Taken by tests that stop nodes (via restore_failover_nodes) and by tests
+    asserting exact deltas on gateway-wide metrics, so neither can run while
+    the other changes or measures cluster state; everything else stays parallel.
+    """
+    # getbasetemp() is per worker; its parent is shared by the whole run
+    lock_path = tmp_path_factory.getbasetemp().parent / "pg_gateway_cluster_state.lock"
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@pytest.fixture(scope="function")
+def restore_failover_nodes(
+    patroni_cluster: PatroniCluster, cluster_state_lock: None
+) -> Generator[None, None, None]:
+    """
+    Restart any node a test stopped via trigger_failover(), so repeated failovers keep a quorum.
+
+    Holds cluster_state_lock for the test; teardown waits for the restarted
+    nodes to run as replicas again (before the lock is released), so the
+    next cluster-mutating test has real failover candidates.
+    """
+    yield
+    if not patroni_cluster.restore_stopped_nodes():
+        pytest.fail("Stopped nodes did not rejoin the cluster as replicas")
+
+
+@lru_cache(maxsize=None)
+def resolve_host(host: str) -> str:
+    """Resolve ``host`` to an IP literal once per session, so connect loops skip getaddrinfo."""
+    return socket.gethostbyname(host)
+
+
 @pytest.fixture(scope="session")
 def patroni_hosts():
     """Return list of Patroni host configurations."""
     return PATRONI_HOSTS
 
 
+@pytest.fixture(scope="session")
+def resolved_patroni_hosts(patroni_hosts):
+    """Patroni host configurations with each host resolved via resolve_host()."""
+    return [(resolve_host(host), pg_port, api_port) for host, pg_port, api_port in patroni_hosts]
+
+
 @pytest.fixture(scope="session")
 def patroni_credentials():
     """Return Patroni connection credentials."""
@@ -314,54 +528,104 @@ def gateway_dsn(patroni_cluster: PatroniCluster) -> str:
 
 
 @pytest.fixture(scope="session")
-def gateway_connection_params(patroni_cluster: PatroniCluster) -> dict:
-    """Return connection parameters for psycopg2."""
-    return {
+def gateway_connection_params(patroni_cluster: PatroniCluster) -> Mapping[str, object]:
+    """Return read-only connection parameters for psycopg2."""
+    return MappingProxyType({
         "host": GATEWAY_HOST,
         "port": GATEWAY_PORT,
         "user": PG_USER,
         "password": PG_PASSWORD,
         "database": PG_DATABASE,
-    }
+    })
+
+@pytest.fixture(scope="session")
+def resolved_gateway_params(gateway_connection_params: Mapping[str, object]) -> Mapping[str, object]:
+    """Gateway params with the host resolved via resolve_host(), so connect loops skip getaddrinfo."""
+    ip = resolve_host(gateway_connection_params["host"])
+    return MappingProxyType({**gateway_connection_params, "host": ip, "hostaddr": ip})
+
 
 @pytest.fixture(scope="session")
-def primary_connection_params(patroni_cluster: PatroniCluster) -> dict:
-    """Return connection parameters for direct connection to current primary."""
+def primary_connection_params(patroni_cluster: PatroniCluster) -> Mapping[str, object]:
+    """Return read-only connection parameters for direct connection to current primary."""
     primary = patroni_cluster.get_primary_info()
     if not primary:
         pytest.fail("Could not determine primary node for direct connection benchmarks")
-    return {
+    return MappingProxyType({
         "host": primary["host"],
         "port": primary["pg_port"],
         "user": PG_USER,
         "password": PG_PASSWORD,
         "database": PG_DATABASE,
-    }
+    })
+
+
+@pytest.fixture(scope="session")
+def pg_pool(gateway_connection_params: Mapping[str, object]) -> Generator[ThreadedConnectionPool, None, None]:
+    """
+    Session-scoped pool of connections through pg_gateway.
+
+    Lets function-scoped fixtures reuse connections instead of paying a
+    TCP + startup + auth handshake per test.
+    """
+    pool = ThreadedConnectionPool(1, 16, **gateway_connection_params)
+    yield pool
+    pool.closeall()
+
+
+def checkout_live_connection(pool: ThreadedConnectionPool) -> psycopg2.extensions.connection:
+    """
+    Borrow a connection from ``pool`` that still answers ``SELECT 1``.
+
+    Idle pooled connections die when a failover test stops the primary they
+    were routed to; those are closed and replaced instead of handed out.
+    """
+    while True:
+        conn = pool.getconn()
+        if not conn.closed:
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                return conn
+            except psycopg2.Error:
+                pass
+        pool.putconn(conn, close=True)
 
 
 @pytest.fixture(scope="function")
-def db_connection(gateway_connection_params: dict) -> Generator[psycopg2.extensions.connection, None, None]:
+def db_connection(pg_pool: ThreadedConnectionPool) -> Generator[psycopg2.extensions.connection, None, None]:
     """
     Function-scoped fixture providing a database connection through pg_gateway.
     
-    Connection is automatically closed after each test.
+    The connection is borrowed from pg_pool (dead ones are replaced on
+    checkout) and returned with its session state reset after each test;
+    broken connections are discarded.
     """
-    conn = None
+    conn = checkout_live_connection(pg_pool)
     try:
-        conn = psycopg2.connect(**gateway_connection_params)
-        conn.autocommit = True
         yield conn
     finally:
-        if conn and not conn.closed:
-            conn.close()
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("DISCARD ALL")
+            except psycopg2.Error:
+                broken = True
+        pg_pool.putconn(conn, close=broken)
 
 
 @pytest.fixture(scope="session")
-def test_database(gateway_connection_params: dict) -> Generator[str, None, None]:
+def test_database(gateway_connection_params: Mapping[str, object]) -> Generator[str, None, None]:
     """
     Session-scoped fixture that creates a test database.
     
-    Creates the database at start and drops it at the end.
+    Creates the database at start and drops it at the end, using one admin
+    connection held open for the whole session. If a failover test killed
+    that connection, the drop reconnects through the gateway.
     """
     conn = psycopg2.connect(**gateway_connection_params)
     conn.autocommit = True
@@ -370,29 +634,31 @@ def test_database(gateway_connection_params: dict) -> Generator[str, None, None]
     # Drop if exists and create fresh
     cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
     cursor.execute(f"CREATE DATABASE {TEST_DATABASE}")
-    cursor.close()
-    conn.close()
-
-    yield TEST_DATABASE
 
-    # Cleanup
-    conn = psycopg2.connect(**gateway_connection_params)
-    conn.autocommit = True
-    cursor = conn.cursor()
-    cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
-    cursor.close()
-    conn.close()
+    try:
+        yield TEST_DATABASE
+    finally:
+        # Cleanup
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
+        except psycopg2.OperationalError:
+            conn.close()
+            conn = psycopg2.connect(**gateway_connection_params)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE}")
+        cursor.close()
+        conn.close()
 
 
 @pytest.fixture(scope="function")
 def test_db_connection(
-    gateway_connection_params: dict, test_database: str
+    gateway_connection_params: Mapping[str, object], test_database: str
 ) -> Generator[psycopg2.extensions.connection, None, None]:
     """
     Function-scoped fixture providing a connection to the test database.
     """
-    params = gateway_connection_params.copy()
-    params["database"] = test_database
+    params = {**gateway_connection_params, "database": test_database}
     conn = None
     try:
         conn = psycopg2.connect(**params)
@@ -436,3 +702,22 @@ def pytest_configure(config):
 def pytest_html_report_title(report):
     """Customize HTML report title."""
     report.title = "pg_gateway Test Report"
+
+
+# Custom benchmark stats for HTML report
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    """Add custom metadata to benchmark results."""
+    output_json["metadata"] = {
+        "test_suite": "pg_gateway",
+        "description": "PostgreSQL Load Balancer Performance Benchmarks",
+    }
+
+
+# Pytest-html hooks for better reporting
+def pytest_html_results_summary(prefix, summary, postfix):
+    """Add benchmark summary to HTML report."""
+    prefix.extend([
+        "<h2>Benchmark Summary</h2>",
+        "<p>Performance benchmarks for pg_gateway PostgreSQL load balancer.</p>",
+        "<p>Lower times indicate better performance.</p>",
+    ])
@@ -5,24 +5,177 @@ Uses pytest-benchmark to measure performance metrics and generates
 HTML reports via pytest-html.
 """
 
+import asyncio
+import io
 import pytest
 import psycopg2
+import psycopg2.extras
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+
+
+BENCH_TARGETS = [
+    pytest.param("gateway_connection_params", id="gateway"),
+    pytest.param("primary_connection_params", id="primary"),
+]
+
+DRIVERS = ["psycopg2", "asyncpg"]
+
+
+@contextmanager
+def _autocommit_cursor(params):
+    conn = psycopg2.connect(**params)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@pytest.fixture(scope="class", params=BENCH_TARGETS)
+def bench_target(request):
+    """Name of the connection-params fixture for the class's current target."""
+    return request.param
+
+
+@pytest.fixture(scope="class")
+def bench_cursor(request, bench_target):
+    """Class-scoped autocommit cursor on each benchmark target."""
+    with _autocommit_cursor(request.getfixturevalue(bench_target)) as cursor:
+        yield cursor
+
+
+@pytest.fixture(scope="class")
+def bench_cursor_on_testdb(request, bench_target, test_database):
+    """Class-scoped autocommit cursor on each target's test database."""
+    params = {**request.getfixturevalue(bench_target), "database": test_database}
+    with _autocommit_cursor(params) as cursor:
+        yield cursor
+
+
+@pytest.fixture(scope="module")
+def shared_executor():
+    """Module-scoped 10-thread executor so benchmarks don't time thread startup."""
+    executor = ThreadPoolExecutor(max_workers=10)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture(scope="module")
+def cached_pool(request):
+    """
+    Module-scoped connection pools, one per connection-params fixture name.
+
+    Returns a getter so parametrized tests can look up the pool for their
+    target; pools are created on first use and closed at module teardown.
+    """
+    pools = {}
+
+    def get(conn_params):
+        if conn_params not in pools:
+            params = request.getfixturevalue(conn_params)
+            pools[conn_params] = ThreadedConnectionPool(1, 32, **params)
+        return pools[conn_params]
+
+    yield get
+    for pool in pools.values():
+        pool.closeall()
+
+
+@pytest.fixture(scope="module")
+def asyncpg_pool(request):
+    """
+    Module-scoped asyncpg pools, one per connection-params fixture name.
+
+    asyncpg pools are bound to the loop that created them, so the fixture
+    owns a single event loop and returns ``(loop, pool)`` for each target.
+    asyncpg is imported on first use, so without it only the asyncpg cases
+    skip; the psycopg2 ones still run.
+    """
+    loop = asyncio.new_event_loop()
+    pools = {}
+
+    def get(conn_params):
+        asyncpg = pytest.importorskip("asyncpg")
+        if conn_params not in pools:
+            params = request.getfixturevalue(conn_params)
+            pools[conn_params] = loop.run_until_complete(
+                asyncpg.create_pool(min_size=10, max_size=10, **params)
+            )
+        return loop, pools[conn_params]
+
+    yield get
+    for pool in pools.values():
+        loop.run_until_complete(pool.close())
+    loop.close()
+
+
+@contextmanager
+def prepare_and_bench(cursor, name, sql, exec_args=()):
+    """PREPARE ``sql`` once and yield a callable that EXECUTEs it by name."""
+    cursor.execute(f"PREPARE {name} AS {sql}")
+    if exec_args:
+        placeholders = ", ".join(["%s"] * len(exec_args))
+        statement = f"EXECUTE {name}({placeholders})"
+    else:
+        statement = f"EXECUTE {name}"
+
+    def execute():
+        cursor.execute(statement, exec_args or None)
+
+    try:
+        yield execute
+    finally:
+        cursor.execute(f"DEALLOCATE {name}")
+
+
+@contextmanager
+def prepared_fetchval(driver, cursor, asyncpg_pool, conn_params, name, sql, exec_args=()):
+    """
+    Yield a callable that runs prepared ``sql`` and returns the first column.
+
+    ``psycopg2`` goes through PREPARE/EXECUTE on ``cursor`` (text format);
+    ``asyncpg`` prepares on a pooled connection and decodes in binary.
+    """
+    if driver == "psycopg2":
+        with prepare_and_bench(cursor, name, sql, exec_args) as execute:
+            def fetchval():
+                execute()
+                return cursor.fetchone()[0]
+
+            yield fetchval
+        return
+
+    loop, pool = asyncpg_pool(conn_params)
+    conn = loop.run_until_complete(pool.acquire())
+    try:
+        stmt = loop.run_until_complete(conn.prepare(sql))
+        yield lambda: loop.run_until_complete(stmt.fetchval(*exec_args))
+    finally:
+        loop.run_until_complete(pool.release(conn))
 
 
 @pytest.mark.benchmark
 class TestConnectionBenchmarks:
     """Benchmark connection-related operations."""
 
+    @pytest.mark.parametrize("sslmode", ["disable", "require"], ids=["plain", "tls"])
     @pytest.mark.parametrize("conn_params,conn_label", [
         pytest.param("gateway_connection_params", "gateway", id="gateway"),
         pytest.param("primary_connection_params", "primary", id="primary"),
     ])
-    def test_connection_latency(self, benchmark, request, conn_params, conn_label):
-        """Benchmark: Time to establish a new connection."""
-        params = request.getfixturevalue(conn_params)
+    def test_cold_connection_latency(self, benchmark, request, conn_params, conn_label, sslmode):
+        """Benchmark: Time to establish a new connection (TCP + startup + auth), with and without TLS."""
+        params = {**request.getfixturevalue(conn_params), "sslmode": sslmode}
+        try:
+            psycopg2.connect(**params).close()
+        except psycopg2.OperationalError as e:
+            pytest.skip(f"sslmode={sslmode} not accepted by {conn_label}: {e}")
+
         def connect():
             conn = psycopg2.connect(**params)
             conn.close()
@@ -35,17 +188,17 @@ class TestConnectionBenchmarks:
         pytest.param("gateway_connection_params", "gateway", id="gateway"),
         pytest.param("primary_connection_params", "primary", id="primary"),
     ])
-    def test_connection_with_query(self, benchmark, request, conn_params, conn_label):
-        """Benchmark: Connection + simple query + disconnect."""
-        params = request.getfixturevalue(conn_params)
+    def test_connection_with_query(self, benchmark, cached_pool, conn_params, conn_label):
+        """Benchmark: Pooled checkout + simple query + return."""
+        pool = cached_pool(conn_params)
         def connect_query_close():
-            conn = psycopg2.connect(**params)
+            conn = pool.getconn()
             conn.autocommit = True
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
             cursor.fetchone()
             cursor.close()
-            conn.close()
+            pool.putconn(conn)
             return True
 
         result = benchmark(connect_query_close)
@@ -56,76 +209,37 @@ class TestConnectionBenchmarks:
 class TestQueryBenchmarks:
     """Benchmark query execution performance."""
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_simple_select(self, benchmark, request, conn_params):
+    @pytest.mark.parametrize("driver", DRIVERS)
+    def test_simple_select(self, benchmark, bench_target, bench_cursor, asyncpg_pool, driver):
         """Benchmark: Simple SELECT query."""
-        params = request.getfixturevalue(conn_params)
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        def simple_query():
-            cursor.execute("SELECT 1")
-            return cursor.fetchone()[0]
-
-        result = benchmark(simple_query)
+        with prepared_fetchval(
+            driver, bench_cursor, asyncpg_pool, bench_target, "bench_simple", "SELECT 1"
+        ) as simple_query:
+            result = benchmark(simple_query)
         assert result == 1
-        cursor.close()
-        conn.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_select_now(self, benchmark, request, conn_params):
+    @pytest.mark.parametrize("driver", DRIVERS)
+    def test_select_now(self, benchmark, bench_target, bench_cursor, asyncpg_pool, driver):
         """Benchmark: SELECT NOW() query."""
-        params = request.getfixturevalue(conn_params)
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        def now_query():
-            cursor.execute("SELECT NOW()")
-            return cursor.fetchone()
-
-        result = benchmark(now_query)
+        with prepared_fetchval(
+            driver, bench_cursor, asyncpg_pool, bench_target, "bench_now", "SELECT NOW()"
+        ) as now_query:
+            result = benchmark(now_query)
         assert result is not None
-        cursor.close()
-        conn.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_parameterized_query(self, benchmark, request, conn_params):
+    @pytest.mark.parametrize("driver", DRIVERS)
+    def test_parameterized_query(self, benchmark, bench_target, bench_cursor, asyncpg_pool, driver):
         """Benchmark: Parameterized query."""
-        params = request.getfixturevalue(conn_params)
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        def param_query():
-            cursor.execute("SELECT %s::int + %s::int", (10, 20))
-            return cursor.fetchone()[0]
-
-        result = benchmark(param_query)
+        with prepared_fetchval(
+            driver, bench_cursor, asyncpg_pool, bench_target,
+            "bench_param", "SELECT $1::int + $2::int", (10, 20)
+        ) as param_query:
+            result = benchmark(param_query)
         assert result == 30
-        cursor.close()
-        conn.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_json_query(self, benchmark, request, conn_params):
+    def test_json_query(self, benchmark, bench_cursor):
         """Benchmark: JSON processing query."""
-        params = request.getfixturevalue(conn_params)
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
+        cursor = bench_cursor
 
         def json_query():
             cursor.execute("""
@@ -139,8 +253,6 @@ class TestQueryBenchmarks:
 
         result = benchmark(json_query)
         assert result["id"] == 1
-        cursor.close()
-        conn.close()
 
 
 @pytest.mark.benchmark
@@ -149,9 +261,11 @@ class TestDataBenchmarks:
 
     @pytest.fixture(autouse=True)
     def setup_benchmark_table(self, test_db_connection):
-        """Create table for benchmarks."""
+        """Create table for benchmarks in a single transaction."""
         cursor = test_db_connection.cursor()
         cursor.execute("""
+            BEGIN;
+            SET LOCAL synchronous_commit = off;
             DROP TABLE IF EXISTS benchmark_data;
             CREATE TABLE benchmark_data (
                 id SERIAL PRIMARY KEY,
@@ -165,24 +279,15 @@ class TestDataBenchmarks:
                 (random() * 1000)::int,
                 md5(random()::text)
             FROM generate_series(1, 1000);
+            COMMIT;
         """)
-        cursor.close()
         yield
-        cursor = test_db_connection.cursor()
         cursor.execute("DROP TABLE IF EXISTS benchmark_data")
         cursor.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_insert_single(self, benchmark, request, test_database, conn_params):
+    def test_insert_single(self, benchmark, bench_cursor_on_testdb):
         """Benchmark: Single row INSERT."""
-        params = request.getfixturevalue(conn_params).copy()
-        params["database"] = test_database
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
+        cursor = bench_cursor_on_testdb
 
         def insert_one():
             cursor.execute(
@@ -193,40 +298,22 @@ class TestDataBenchmarks:
 
         result = benchmark(insert_one)
         assert result is True
-        cursor.close()
-        conn.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_select_by_id(self, benchmark, request, test_database, conn_params):
+    def test_select_by_id(self, benchmark, bench_cursor_on_testdb):
         """Benchmark: SELECT by primary key."""
-        params = request.getfixturevalue(conn_params).copy()
-        params["database"] = test_database
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
-
-        def select_by_id():
-            cursor.execute("SELECT * FROM benchmark_data WHERE id = %s", (500,))
-            return cursor.fetchone()
+        cursor = bench_cursor_on_testdb
+        with prepare_and_bench(
+            cursor, "bench_by_id", "SELECT * FROM benchmark_data WHERE id = $1", (500,)
+        ) as execute:
+            def select_by_id():
+                execute()
+                return cursor.fetchone()
 
-        result = benchmark(select_by_id)
-        cursor.close()
-        conn.close()
+            result = benchmark(select_by_id)
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_select_range(self, benchmark, request, test_database, conn_params):
+    def test_select_range(self, benchmark, bench_cursor_on_testdb):
         """Benchmark: SELECT range of rows."""
-        params = request.getfixturevalue(conn_params).copy()
-        params["database"] = test_database
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
+        cursor = bench_cursor_on_testdb
 
         def select_range():
             cursor.execute(
@@ -237,20 +324,10 @@ class TestDataBenchmarks:
 
         result = benchmark(select_range)
         assert len(result) > 0
-        cursor.close()
-        conn.close()
 
-    @pytest.mark.parametrize("conn_params", [
-        pytest.param("gateway_connection_params", id="gateway"),
-        pytest.param("primary_connection_params", id="primary"),
-    ])
-    def test_aggregate_query(self, benchmark, request, test_database, conn_params):
+    def test_aggregate_query(self, benchmark, bench_cursor_on_testdb):
         """Benchmark: Aggregate query."""
-        params = request.getfixturevalue(conn_params).copy()
-        params["database"] = test_database
-        conn = psycopg2.connect(**params)
-        conn.autocommit = True
-        cursor = conn.cursor()
+        cursor = bench_cursor_on_testdb
 
         def aggregate():
             cursor.execute("""
@@ -265,8 +342,6 @@ class TestDataBenchmarks:
 
         result = benchmark(aggregate)
         assert result[0] > 0  # count should be positive
-        cursor.close()
-        conn.close()
 
 
 @pytest.mark.benchmark
@@ -277,18 +352,15 @@ class TestConcurrencyBenchmarks:
         pytest.param("gateway_connection_params", id="gateway"),
         pytest.param("primary_connection_params", id="primary"),
     ])
-    def test_concurrent_connections(self, benchmark, request, conn_params):
+    def test_concurrent_connections(self, benchmark, request, shared_executor, conn_params):
         """Benchmark: Opening 10 concurrent connections."""
         params = request.getfixturevalue(conn_params)
         def open_concurrent():
             connections = []
             try:
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    futures = [
-                        executor.submit(psycopg2.connect, **params)
-                        for _ in range(10)
-                    ]
-                    connections = [f.result() for f in as_completed(futures)]
+                connections = list(
+                    shared_executor.map(lambda _: psycopg2.connect(**params), range(10))
+                )
                 return len(connections)
             finally:
                 for conn in connections:
@@ -302,25 +374,20 @@ class TestConcurrencyBenchmarks:
         pytest.param("gateway_connection_params", id="gateway"),
         pytest.param("primary_connection_params", id="primary"),
     ])
-    def test_concurrent_queries(self, benchmark, request, conn_params):
-        """Benchmark: 10 concurrent queries on separate connections."""
-        params = request.getfixturevalue(conn_params)
-        def concurrent_queries():
-            def query_worker():
-                conn = psycopg2.connect(**params)
-                conn.autocommit = True
-                cursor = conn.cursor()
-                cursor.execute("SELECT pg_sleep(0.001), 1")  # 1ms sleep + select
-                result = cursor.fetchone()[1]
-                cursor.close()
-                conn.close()
-                return result
-
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [executor.submit(query_worker) for _ in range(10)]
-                results = [f.result() for f in as_completed(futures)]
+    def test_concurrent_queries(self, benchmark, asyncpg_pool, conn_params):
+        """Benchmark: 10 concurrent queries on separate pooled connections (asyncpg)."""
+        loop, pool = asyncpg_pool(conn_params)
+
+        async def run():
+            # 1ms sleep + select on each of the pool's 10 connections
+            results = await asyncio.gather(*[
+                pool.fetchval("SELECT 1 FROM pg_sleep(0.001)") for _ in range(10)
+            ])
             return sum(results)
 
+        def concurrent_queries():
+            return loop.run_until_complete(run())
+
         result = benchmark(concurrent_queries)
         assert result == 10
 
@@ -341,26 +408,27 @@ class TestThroughputBenchmarks:
         cursor = conn.cursor()
 
         def batch_queries():
-            for i in range(100):
-                cursor.execute("SELECT %s", (i,))
-                cursor.fetchone()
-            return True
+            # One round-trip: execute_batch joins all 100 statements into a
+            # single message; only the last result set is left to fetch.
+            psycopg2.extras.execute_batch(
+                cursor, "SELECT %s", [(i,) for i in range(100)], page_size=100
+            )
+            return cursor.fetchone()[0]
 
         result = benchmark(batch_queries)
-        assert result is True
+        assert result == 99
         cursor.close()
         conn.close()
 
+    @pytest.mark.parametrize("method", ["copy", "values"])
     @pytest.mark.parametrize("conn_params", [
         pytest.param("gateway_connection_params", id="gateway"),
         pytest.param("primary_connection_params", id="primary"),
     ])
-    def test_insert_throughput(self, benchmark, request, test_database, conn_params):
-        """Benchmark: Inserts per iteration (100 inserts)."""
-        params = request.getfixturevalue(conn_params).copy()
-        params["database"] = test_database
+    def test_insert_throughput(self, benchmark, request, test_database, conn_params, method):
+        """Benchmark: Inserts per iteration (100 rows, one transaction)."""
+        params = {**request.getfixturevalue(conn_params), "database": test_database}
         conn = psycopg2.connect(**params)
-        conn.autocommit = True
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS throughput_test (
@@ -368,15 +436,28 @@ class TestThroughputBenchmarks:
                 value INT
             )
         """)
+        conn.commit()
+
+        payload = "\n".join(map(str, range(100))) + "\n"
+        rows = [(i,) for i in range(100)]
 
         def batch_inserts():
-            for i in range(100):
-                cursor.execute("INSERT INTO throughput_test (value) VALUES (%s)", (i,))
+            if method == "copy":
+                cursor.copy_expert(
+                    "COPY throughput_test (value) FROM STDIN", io.StringIO(payload)
+                )
+            else:
+                psycopg2.extras.execute_values(
+                    cursor, "INSERT INTO throughput_test (value) VALUES %s",
+                    rows, page_size=100
+                )
+            conn.commit()
             return True
 
         result = benchmark(batch_inserts)
         assert result is True
         cursor.execute("DROP TABLE IF EXISTS throughput_test")
+        conn.commit()
         cursor.close()
         conn.close()
 
@@ -390,23 +471,30 @@ class TestLatencyBenchmarks:
         pytest.param("primary_connection_params", id="primary"),
     ])
     def test_round_trip_latency(self, benchmark, request, conn_params):
-        """Benchmark: Round-trip latency (ping-like)."""
+        """Benchmark: Round-trip latency (ping-like), 100 round-trips per timed call."""
         params = request.getfixturevalue(conn_params)
         conn = psycopg2.connect(**params)
         conn.autocommit = True
         cursor = conn.cursor()
-
-        def ping():
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            return True
-
-        # Run with specific iterations for latency measurement
-        result = benchmark.pedantic(
-            ping,
-            iterations=100,
-            rounds=10,
-        )
+        round_trips = 100
+
+        with prepare_and_bench(cursor, "bench_ping", "SELECT 1") as execute:
+            def ping_batch():
+                for _ in range(round_trips):
+                    execute()
+                    cursor.fetchone()
+                return True
+
+            # One call covers all round-trips, so per-call harness overhead
+            # is spread over 100 real pings instead of timed with each one.
+            result = benchmark.pedantic(
+                ping_batch,
+                iterations=1,
+                rounds=10,
+            )
+        benchmark.extra_info["round_trips"] = round_trips
+        if benchmark.stats:
+            benchmark.extra_info["mean_per_round_trip"] = benchmark.stats.stats.mean / round_trips
         cursor.close()
         conn.close()
 
@@ -434,21 +522,3 @@ class TestLatencyBenchmarks:
         cursor.close()
         conn.close()
 
-
-# Custom benchmark stats for HTML report
-def pytest_benchmark_update_json(config, benchmarks, output_json):
-    """Add custom metadata to benchmark results."""
-    output_json["metadata"] = {
-        "test_suite": "pg_gateway",
-        "description": "PostgreSQL Load Balancer Performance Benchmarks",
-    }
-
-
-# Pytest-html hooks for better reporting
-def pytest_html_results_summary(prefix, summary, postfix):
-    """Add benchmark summary to HTML report."""
-    prefix.extend([
-        "<h2>Benchmark Summary</h2>",
-        "<p>Performance benchmarks for pg_gateway PostgreSQL load balancer.</p>",
-        "<p>Lower times indicate better performance.</p>",
-    ])
@@ -5,10 +5,13 @@ Tests basic connection functionality, connection pooling,
 and various connection scenarios through the load balancer.
 """
 
+import io
+import struct
 import pytest
 import psycopg2
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from psycopg2.pool import ThreadedConnectionPool
 
 
 class TestBasicConnection:
@@ -131,12 +134,25 @@ class TestConnectionResilience:
         cursor2.close()
         conn2.close()
 
-    def test_rapid_connect_disconnect(self, gateway_connection_params):
+    def test_rapid_connect_disconnect_cold(self, gateway_connection_params):
         """Test rapid connection/disconnection cycles."""
         for _ in range(50):
             conn = psycopg2.connect(**gateway_connection_params)
             conn.close()
 
+    def test_rapid_getconn_putconn(self, gateway_connection_params):
+        """Test rapid checkout/return cycles against a warm connection pool."""
+        pool = ThreadedConnectionPool(
+            5, 50, keepalives=1, keepalives_idle=60, **gateway_connection_params
+        )
+        try:
+            for _ in range(50):
+                conn = pool.getconn()
+                assert not conn.closed
+                pool.putconn(conn)
+        finally:
+            pool.closeall()
+
     @pytest.mark.timeout(30)
     def test_connection_timeout_handling(self):
         """Test connection to invalid host times out properly."""
@@ -270,13 +286,22 @@ class TestLargeData:
         count = cursor.fetchone()[0]
         assert count == 1000
         
-        # Fetch all rows
-        cursor.execute("SELECT * FROM large_data")
-        rows = cursor.fetchall()
-        assert len(rows) == 1000
-        
         cursor.close()
 
+        # Stream rows through a server-side cursor, 500 per round-trip;
+        # named cursors need an open transaction.
+        test_db_connection.autocommit = False
+        stream = test_db_connection.cursor(name="large_cur", withhold=False)
+        stream.itersize = 500
+        try:
+            stream.execute("SELECT * FROM large_data")
+            fetched = sum(1 for _ in stream)
+            assert fetched == 1000
+        finally:
+            stream.close()
+            test_db_connection.rollback()  # Ensure no active transaction
+            test_db_connection.autocommit = True
+
     def test_large_insert(self, test_db_connection):
         """Test inserting large text data."""
         cursor = test_db_connection.cursor()
@@ -288,12 +313,21 @@ class TestLargeData:
             )
         """)
         
-        # Insert 1MB of text
-        large_text = "x" * (1024 * 1024)
-        cursor.execute("INSERT INTO large_text (content) VALUES (%s) RETURNING id", (large_text,))
-        inserted_id = cursor.fetchone()[0]
+        # Insert 1MB of text as a single-row binary COPY: signature, flags and
+        # header-extension words, one length-prefixed field, then the trailer.
+        large_text = b"x" * (1024 * 1024)
+        payload = b"".join((
+            b"PGCOPY\n\xff\r\n\0",
+            struct.pack("!ii", 0, 0),
+            struct.pack("!hi", 1, len(large_text)),
+            large_text,
+            struct.pack("!h", -1),
+        ))
+        cursor.copy_expert(
+            "COPY large_text (content) FROM STDIN BINARY", io.BytesIO(payload)
+        )
         
-        cursor.execute("SELECT LENGTH(content) FROM large_text WHERE id = %s", (inserted_id,))
+        cursor.execute("SELECT LENGTH(content) FROM large_text ORDER BY id DESC LIMIT 1")
         length = cursor.fetchone()[0]
         assert length == 1024 * 1024
         
@@ -2,6 +2,11 @@ import pytest
 import requests
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, closing
+import docker
+import psycopg2
+from requests.adapters import HTTPAdapter
 
 # Define constants here instead of importing from conftest
 GATEWAY_HOST = os.getenv("GATEWAY_HOST", "localhost")
@@ -10,69 +15,190 @@ GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "6432"))
 METRICS_PORT = 9090
 METRICS_URL = f"http://{GATEWAY_HOST}:{METRICS_PORT}/metrics"
 
+# Metric subsets the tests read; get_metrics() skips everything else
+ACTIVE_METRICS = frozenset({"pg_gateway_connections_active"})
+SERVER_METRICS = frozenset({
+    "pg_gateway_servers_total",
+    "pg_gateway_servers_healthy",
+    "pg_gateway_servers_unhealthy",
+})
+
+
+def _metrics_session() -> requests.Session:
+    """Session with a small, bounded keep-alive pool for scraping METRICS_URL."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    return session
+
+
+def _raw_lines(response, max_chunk=16384):
+    """
+    Yield exposition lines as undecoded bytes from a streamed response.
+
+    Reads are sized from Content-Length (capped at ``max_chunk``) so a small
+    body comes off the socket in one read; without the header, 8 KiB reads.
+    """
+    length = int(response.headers.get("Content-Length", 0))
+    chunk_size = min(length, max_chunk) if length else 8192
+    buf = b""
+    for chunk in response.iter_content(chunk_size):
+        lines = (buf + chunk).split(b"\n")
+        buf = lines.pop()
+        yield from lines
+    if buf:
+        yield buf
+
+
+def _gateway_connect(**kwargs):
+    return psycopg2.connect(
+        host=GATEWAY_HOST,
+        port=GATEWAY_PORT,
+        user="postgres",
+        password="postgres",
+        database="postgres",
+        **kwargs,
+    )
+
+
+def _gateway_answers():
+    """True if a fresh gateway connection can run ``SELECT 1``."""
+    try:
+        with closing(_gateway_connect(connect_timeout=1)) as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _warm_metrics(patroni_cluster):
+    """Wait (up to 10s) for the first 200 from METRICS_URL before any test scrapes it."""
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            if TestMetrics._session.get(METRICS_URL, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+
+
 class TestMetrics:
     """Test Prometheus metrics endpoint."""
 
-    def get_metrics(self):
-        """Fetch and parse metrics."""
-        response = requests.get(METRICS_URL)
-        assert response.status_code == 200
-        lines = response.text.splitlines()
-        metrics = {}
-        for line in lines:
-            if line.startswith("#") or not line.strip():
-                continue
-            parts = line.split()
-            if len(parts) >= 2:
-                key = parts[0]
-                value = float(parts[1])
-                metrics[key] = value
+    _session = _metrics_session()
+    # (scraped_at, wanted, metrics); per test instance, so nothing leaks between tests
+    _cache = (0.0, None, None)
+    _cache_ttl = 0.25
+
+    def get_metrics(self, wanted=None, force=False):
+        """
+        Fetch and parse metrics as raw bytes, one exposition line at a time.
+
+        With ``wanted``, only those names are parsed and the scrape stops
+        reading as soon as all of them have been seen. A scrape for the same
+        names younger than ``_cache_ttl`` is reused unless ``force`` is set.
+        """
+        now = time.monotonic()
+        scraped_at, cached_wanted, cached = self._cache
+        if not force and cached is not None and cached_wanted == wanted and now - scraped_at < self._cache_ttl:
+            return cached
+
+        wanted_raw = None if wanted is None else frozenset(k.encode("ascii") for k in wanted)
+        raw = {}
+        with self._session.get(METRICS_URL, timeout=5, stream=True) as response:
+            assert response.status_code == 200
+            for line in _raw_lines(response):
+                if not line or line[:1] == b"#":
+                    continue
+                key, sep, rest = line.partition(b" ")
+                if not sep or (wanted_raw is not None and key not in wanted_raw):
+                    continue
+                raw[key] = rest.partition(b" ")[0]
+                if wanted_raw is not None and len(raw) == len(wanted_raw):
+                    break
+        # Decode names and convert values in one pass once the body is read;
+        # float() parses the bytes directly
+        metrics = dict(zip(
+            (key.decode("ascii") for key in raw),
+            map(float, raw.values()),
+        ))
+        self._cache = (now, wanted, metrics)
         return metrics
 
+    def _wait_for_metric(self, key, pred, timeout, interval=0.1, wanted=None):
+        """
+        Re-scrape until ``pred(metrics[key])`` holds or ``timeout`` passes; return the last scrape.
+
+        The first scrape bypasses the cache since callers wait right after
+        changing something; later polls may be served from it.
+        """
+        wanted = wanted or frozenset({key})
+        deadline = time.monotonic() + timeout
+        force = True
+        while True:
+            metrics = self.get_metrics(wanted, force=force)
+            force = False
+            if pred(metrics.get(key, 0)) or time.monotonic() >= deadline:
+                return metrics
+            time.sleep(interval)
+
+    def _wait_cluster_ready(self, pred, timeout=30):
+        """
+        Wait until the healthy count satisfies ``pred`` and the gateway serves
+        ``SELECT 1``; return the last server-metrics scrape.
+        """
+        return self._wait_for_metric(
+            "pg_gateway_servers_healthy",
+            lambda v: pred(v) and _gateway_answers(),
+            timeout=timeout,
+            wanted=SERVER_METRICS,
+        )
+
     def test_when_metrics_endpoint_is_accessed_then_it_is_reachable(self, patroni_cluster):
         """Test that metrics endpoint is up and returns 200 OK."""
-        response = requests.get(METRICS_URL)
+        response = self._session.get(METRICS_URL, timeout=5)
         assert response.status_code == 200
         assert "text/plain" in response.headers["Content-Type"]
 
+    @pytest.mark.usefixtures("cluster_state_lock")
     def test_when_multiple_connections_opened_then_active_count_increments(self):
         """Test strict accuracy of connection metrics."""
         # Get baseline
-        m_base = self.get_metrics()
+        m_base = self.get_metrics(ACTIVE_METRICS, force=True)
         base_active = m_base.get("pg_gateway_connections_active", 0)
         
-        conns = []
         target_count = 5
-        try:
-            # Open multiple connections
-            import psycopg2
-            for _ in range(target_count):
-                c = psycopg2.connect(
-                    host=GATEWAY_HOST,
-                    port=GATEWAY_PORT,
-                    user="postgres",
-                    password="postgres",
-                    database="postgres"
-                )
-                conns.append(c)
+        with ExitStack() as stack:
+            # Open multiple connections, handshakes overlapping
+            with ThreadPoolExecutor(max_workers=target_count) as ex:
+                futures = [ex.submit(_gateway_connect) for _ in range(target_count)]
+            # Register every connection that opened before surfacing a failed one
+            errors = []
+            for future in futures:
+                if future.exception() is None:
+                    stack.callback(future.result().close)
+                else:
+                    errors.append(future.exception())
+            if errors:
+                raise errors[0]
             
             # Allow metric update
-            time.sleep(0.5)
-            
-            m_new = self.get_metrics()
+            m_new = self._wait_for_metric(
+                "pg_gateway_connections_active",
+                lambda v: v >= base_active + target_count,
+                timeout=5,
+            )
             new_active = m_new.get("pg_gateway_connections_active", 0)
             
             # Check exact increase
             # Note: other tests might be running or connections lingering, assuming isolated run here
             assert new_active >= base_active + target_count
-            
-        finally:
-            for c in conns:
-                c.close()
                 
         # Wait for cleanup
-        time.sleep(0.5)
-        m_final = self.get_metrics()
+        m_final = self._wait_for_metric(
+            "pg_gateway_connections_active", lambda v: v < new_active, timeout=5
+        )
         final_active = m_final.get("pg_gateway_connections_active", 0)
         
         # Check return to baseline (approximate, as other things might connect)
@@ -80,7 +206,7 @@ class TestMetrics:
 
     def test_when_server_metrics_are_checked_then_counts_are_valid(self, patroni_cluster):
         """Test that server counts are sanity checkable."""
-        metrics = self.get_metrics()
+        metrics = self.get_metrics(SERVER_METRICS)
         
         # Check existence of keys
         assert "pg_gateway_servers_total" in metrics
@@ -98,28 +224,35 @@ class TestMetrics:
         assert healthy > 0
         assert unhealthy == total - healthy
 
-    def test_when_node_stops_then_healthy_server_count_decreases(self):
+    @pytest.mark.slow
+    @pytest.mark.usefixtures("cluster_state_lock")
+    def test_when_node_stops_then_healthy_server_count_decreases(self, patroni_cluster):
         """Test that server health metrics update when a node goes down and comes back up."""
-        import subprocess
+        client = patroni_cluster.docker_client
 
-        # Ensure all nodes are running first to avoid flake from previous tests
+        def start(name):
+            try:
+                client.containers.get(name).start()
+            except docker.errors.APIError:
+                pass
+
+        # Ensure all nodes are running first to avoid flake from previous tests;
+        # one list call tells us which (if any) actually need starting
         containers = ["patroni1", "patroni2", "patroni3"]
-        for c in containers:
-             subprocess.run(["docker", "start", c], check=False, capture_output=True)
+        running = {c.name for c in client.containers.list()}
+        to_start = [c for c in containers if c not in running]
+        if to_start:
+            with ThreadPoolExecutor(max_workers=len(to_start)) as ex:
+                list(ex.map(start, to_start))
         
-        # Wait for cluster to stabilize (expecting 3 healthy)
-        start_wait = time.time()
-        while time.time() - start_wait < 30:
-            m = self.get_metrics()
-            if m.get("pg_gateway_servers_healthy", 0) >= 3:
-                break
-            time.sleep(1)
+        # Wait for cluster to stabilize (expecting 3 healthy); the last scrape
+        # doubles as the baseline
+        m_base = self._wait_cluster_ready(lambda v: v >= 3)
 
         # We'll stop one of the patroni nodes and verify the healthy count drops
         # We choose patroni3 assuming it's likely a replica or at least one of 3
         container_to_stop = "patroni3"
         
-        m_base = self.get_metrics()
         healthy_base = m_base.get("pg_gateway_servers_healthy", 0)
         unhealthy_base = m_base.get("pg_gateway_servers_unhealthy", 0)
         
@@ -127,20 +260,22 @@ class TestMetrics:
         if healthy_base == 0:
             pytest.skip("Cluster has no healthy nodes, cannot test count decrease")
             
+        healthy_new = None  # stays None if the stop or the wait below raises
         try:
             print(f"Stopping {container_to_stop}...")
-            subprocess.run(["docker", "stop", container_to_stop], check=True, capture_output=True)
-            
-            # Wait for pg_gateway health check (default 2s) + some buffer
-            time.sleep(4)
-            
-            m_new = self.get_metrics()
-            healthy_new = m_new.get("pg_gateway_servers_healthy", 0)
-            unhealthy_new = m_new.get("pg_gateway_servers_unhealthy", 0)
+            client.containers.get(container_to_stop).stop()
             
             # Verify shift from healthy to unhealthy
             # Ensure we don't go below 0
             expected_healthy = max(0, healthy_base - 1)
+
+            # Wait for pg_gateway health check (default 2s) to notice
+            m_new = self._wait_for_metric(
+                "pg_gateway_servers_healthy", lambda v: v == expected_healthy, timeout=15,
+                wanted=SERVER_METRICS,
+            )
+            healthy_new = m_new.get("pg_gateway_servers_healthy", 0)
+            unhealthy_new = m_new.get("pg_gateway_servers_unhealthy", 0)
             
             assert healthy_new == expected_healthy
             assert unhealthy_new == unhealthy_base + 1
@@ -148,15 +283,17 @@ class TestMetrics:
         finally:
             # Restore the cluster state
             print(f"Starting {container_to_stop}...")
-            subprocess.run(["docker", "start", container_to_stop], check=True, capture_output=True)
+            client.containers.get(container_to_stop).start()
             # Give it time to become healthy again
-            time.sleep(15)
-            
-            m_final = self.get_metrics()
-            healthy_final = m_final.get("pg_gateway_servers_healthy", 0)
-            
-            # We only check if it recovered at least partially
-            # It might not reach full 3 immediately if leadership changed
-            assert healthy_final > healthy_new
+            if healthy_new is None:
+                # The try block already failed; just restore, keeping its error
+                self._wait_cluster_ready(lambda v: v >= healthy_base)
+            else:
+                m_final = self._wait_cluster_ready(lambda v: v > healthy_new)
+                healthy_final = m_final.get("pg_gateway_servers_healthy", 0)
+
+                # We only check if it recovered at least partially
+                # It might not reach full 3 immediately if leadership changed
+                assert healthy_final > healthy_new
 
 